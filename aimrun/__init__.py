@@ -7,10 +7,18 @@ from threading import Thread
 from .commands.sync import do_sync
 from .utils import clean_args, get_repo, get_runs, get_strict, get_threads, graceful_exit, set_repo
 
+_main_process = None
+def is_main_process():
+    global _main_process
+    if _main_process is None:
+        _main_process = PartialState().is_main_process
+    return _main_process
+
 def on_main_process(function):
     @wraps(function)
     def execute_on_main_process(*args, **kwargs):
-        PartialState().on_main_process(function)(*args, **kwargs)
+        if is_main_process():
+            return function(*args, **kwargs)
     return execute_on_main_process
 
 @on_main_process
@@ -63,16 +71,96 @@ def close():
 
 # wandb interface
 
+@on_main_process
+def _set_args(args):
+    for run in get_runs():
+        run['args'] = clean_args(args)
+
+@on_main_process
+def _set_summary(summary):
+    summary = {k: v.item() if hasattr(v, "item") else v for k, v in summary.items()}
+    for run in get_runs():
+        run['summary'] = clean_args(summary)
+
+class _Config(dict):
+    _dirty = False
+    def __getattr__(self, key):
+        try:
+            return self[key]
+        except KeyError:
+            raise AttributeError(key)
+    def __setattr__(self, key, val):
+        self[key] = val
+    def __setitem__(self, key, val):
+        dict.__setitem__(self, key, val)
+        object.__setattr__(self, "_dirty", True)
+    def update(self, d=None, allow_val_change=None, **kwargs):
+        dict.update(self, d or {}, **kwargs)
+        object.__setattr__(self, "_dirty", True)
+        self._commit()
+    def _reset(self, config):
+        dict.clear(self)
+        dict.update(self, config or {})
+        object.__setattr__(self, "_dirty", False)
+    def _commit(self):
+        if self._dirty:
+            _set_args(dict(self))
+            object.__setattr__(self, "_dirty", False)
+
+def _scalar(value):
+    if hasattr(value, "item"):
+        try:
+            value = value.item()
+        except (RuntimeError, ValueError):
+            return None
+    return value if isinstance(value, (bool, int, float)) else None
+
 class wandb:
+    config = _Config()
+    summary = {}
+    _step = 0
+    _buffer = {}
+    _kwargs = {}
     @staticmethod
     def init(project=None, name=None, config=None, **kwargs):
+        wandb._step = 0
+        wandb._buffer = {}
+        wandb._kwargs = {}
+        wandb.config._reset(config)
+        wandb.summary.clear()
         _init(experiment=project, args=config, description=name, **kwargs)
     @staticmethod
-    def log(*args, **kwargs):
-        _track(*args, **kwargs)
+    def _flush():
+        wandb.config._commit()
+        if wandb._buffer:
+            _track(wandb._buffer, step=wandb._step, **wandb._kwargs)
+            scalars = {k: _scalar(v) for k, v in wandb._buffer.items()}
+            wandb.summary.update({k: v for k, v in scalars.items() if v is not None})
+            wandb._buffer = {}
+    @staticmethod
+    def log(data, step=None, commit=None, sync=None, **kwargs):
+        if step is not None:
+            if step < wandb._step:
+                print(f"WARNING: step {step} is smaller than current step {wandb._step} - dropping data.", file=sys.stderr)
+                return
+            if step > wandb._step:
+                wandb._flush()
+                wandb._step = step
+        if kwargs != wandb._kwargs:
+            wandb._flush()
+            wandb._kwargs = kwargs
+        wandb._buffer.update(data)
+        if commit or (commit is None and step is None):
+            wandb._flush()
+            wandb._step += 1
     @staticmethod
     def finish():
-        _close()
+        try:
+            wandb._flush()
+            if wandb.summary:
+                _set_summary(wandb.summary)
+        finally:
+            _close()
     @staticmethod
     def set_default_repo(repo):
         set_repo(repo)
@@ -1,10 +1,12 @@
 import click
 
+from .commands.benchmark import _benchmark
 from .commands.extract import _extract
 from .commands.plot import _plot
 from .commands.sync import _sync
 
 cli = click.CommandCollection(sources=[
+    _benchmark,
     _extract,
     _plot,
     _sync,
@@ -0,0 +1,184 @@
+import click
+import itertools
+import multiprocessing
+import pandas as pd
+from queue import Empty
+import socket
+import subprocess
+import tempfile
+import time
+
+from ..utils import (
+    ERROR,
+    INFO,
+    DETAIL,
+    PROGRESS,
+    get_verbosity,
+    install_signal_handler,
+    log,
+    set_verbosity,
+    should_exit,
+)
+
+MODES = ["aim", "aimrun", "wandb"]
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)] if values else float("nan")
+
+def benchmark_worker(mode, repo, num_runs, num_metrics, steps, warmup, queue):
+    import aim
+    import aimrun
+    from aimrun.utils import get_runs
+    if mode == "aim":
+        runs = [aim.Run(repo=repo, experiment="aimrun-benchmark") for _ in range(num_runs)]
+        def track(values, step):
+            for run in runs:
+                run.track(values, step=step)
+        def close():
+            for run in runs:
+                run.close()
+    elif mode == "aimrun":
+        for _ in range(num_runs):
+            aimrun.init(repo=repo, experiment="aimrun-benchmark", args={"mode": mode})
+        track = lambda values, step: aimrun.track(values, step=step)
+        close = aimrun.close
+    elif mode == "wandb":
+        for _ in range(num_runs):
+            aimrun.wandb.init(project="aimrun-benchmark", config={"mode": mode}, repo=repo)
+        track = lambda values, step: aimrun.wandb.log(values, step=step)
+        close = aimrun.wandb.finish
+    else:
+        raise ValueError(f"unknown benchmark mode {mode}")
+    values = {f"metric_{i}": float(i) for i in range(num_metrics)}
+    latencies = []
+    for step in range(warmup + steps):
+        start = time.perf_counter()
+        track(values, step)
+        if step >= warmup:
+            latencies.append(time.perf_counter() - start)
+    close()
+    get_runs().clear()
+    queue.put(latencies)
+
+def wait_for_server(server, port, timeout):
+    start = time.monotonic()
+    while time.monotonic() - start < timeout:
+        if server.poll() is not None:
+            raise RuntimeError(f"aim server exited with code {server.returncode}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1.0):
+                return time.monotonic() - start
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError(f"aim server did not accept connections on port {port} within {timeout}s")
+
+def run_benchmark(mode, repo, num_runs, num_metrics, num_processes, steps, warmup):
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    processes = [ctx.Process(target=benchmark_worker, args=(mode, repo, num_runs, num_metrics, steps, warmup, queue)) for _ in range(num_processes)]
+    start = time.perf_counter()
+    for process in processes:
+        process.start()
+    latencies = []
+    received = 0
+    try:
+        while received < len(processes):
+            try:
+                latencies.extend(queue.get(timeout=1.0))
+                received += 1
+            except Empty:
+                failed = [process.exitcode for process in processes if process.exitcode not in (None, 0)]
+                if failed:
+                    raise RuntimeError(f"{len(failed)} benchmark workers failed with exit codes {failed}")
+    finally:
+        for process in processes:
+            if process.is_alive() and received < len(processes):
+                process.terminate()
+            process.join()
+    elapsed = time.perf_counter() - start
+    track_time = sum(latencies)
+    return {
+        "mode": mode,
+        "repo": repo,
+        "runs": num_runs,
+        "metrics": num_metrics,
+        "processes": num_processes,
+        "calls": len(latencies),
+        "mean_us": 1e6 * track_time / len(latencies),
+        "p50_us": 1e6 * percentile(latencies, 0.5),
+        "p99_us": 1e6 * percentile(latencies, 0.99),
+        "calls_per_s": len(latencies) / track_time * num_processes,
+        "values_per_s": len(latencies) * num_runs * num_metrics / track_time * num_processes,
+        "wall_s": elapsed,
+    }
+
+@click.group()
+def _benchmark():
+    pass
+@_benchmark.command()
+@click.option("--repo", default=None, multiple=True, help="Repository or repositories to track to (default: temporary local repository)")
+@click.option("--mode", default=MODES, multiple=True, type=click.Choice(MODES), help=f"Tracking interface(s) to benchmark (default: {' '.join(MODES)})")
+@click.option("--runs", default=[1], multiple=True, help="Number(s) of runs tracked to at once (default: 1)")
+@click.option("--metrics", default=[1], multiple=True, help="Number(s) of metrics per tracked dictionary (default: 1)")
+@click.option("--processes", default=[1], multiple=True, help="Number(s) of concurrently tracking processes (default: 1)")
+@click.option("--steps", default=1000, help="Number of timed track calls per process (default: 1000)")
+@click.option("--warmup", default=10, help="Number of untimed track calls per process (default: 10)")
+@click.option("--server-port", default=None, type=int, help="Start a local aim server on this port and benchmark it as well (default: None)")
+@click.option("--server-timeout", default=60.0, help="Maximum time in seconds to wait for the local aim server to start (default: 60.0)")
+@click.option("--output", default=None, help="Path to save the results as CSV (default: None)")
+@click.option("--verbosity", default=get_verbosity(), help=f"Verbosity of the output (default: {get_verbosity()})")
+def benchmark(repo, mode, runs, metrics, processes, steps, warmup, server_port, server_timeout, output, verbosity):
+    install_signal_handler()
+    do_benchmark(repo, mode, runs, metrics, processes, steps, warmup, server_port, server_timeout, output, verbosity)
+
+def do_benchmark(
+        repo=None,
+        mode=MODES,
+        runs=[1],
+        metrics=[1],
+        processes=[1],
+        steps=1000,
+        warmup=10,
+        server_port=None,
+        server_timeout=60,
+        output=None,
+        verbosity=get_verbosity(),
+    ):
+    set_verbosity(verbosity)
+    tmp_dir = None
+    server = None
+    repos = list(repo) if repo else []
+    try:
+        if not repos or server_port is not None:
+            tmp_dir = tempfile.TemporaryDirectory(prefix="aimrun-benchmark-")
+            log(DETAIL, f"initializing local repository at {tmp_dir.name}")
+            subprocess.run(["aim", "init", "--repo", tmp_dir.name], check=True, capture_output=True)
+            if not repos:
+                repos.append(tmp_dir.name)
+        if server_port is not None:
+            log(INFO, f"starting aim server on port {server_port}")
+            server = subprocess.Popen(["aim", "server", "--repo", tmp_dir.name, "--port", str(server_port)], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            log(DETAIL, f"aim server accepting connections after {wait_for_server(server, server_port, server_timeout):.2f}s")
+            repos.append(f"aim://127.0.0.1:{server_port}")
+        results = []
+        for _repo, _mode, num_runs, num_metrics, num_processes in itertools.product(repos, mode, runs, metrics, processes):
+            if should_exit():
+                break
+            log(DETAIL, f"benchmarking {_mode} on {_repo} with {num_runs} runs, {num_metrics} metrics and {num_processes} processes")
+            result = run_benchmark(_mode, _repo, num_runs, num_metrics, num_processes, steps, warmup)
+            log(PROGRESS, " ".join(f"{k}={v:.2f}" if isinstance(v, float) else f"{k}={v}" for k, v in result.items()))
+            results.append(result)
+        if output is not None and results:
+            pd.DataFrame(results).to_csv(output, index=False)
+            log(INFO, f"results saved to {output}")
+        return results
+    except Exception as e:
+        log(ERROR, f"failure: benchmark failed - {e}")
+        raise e
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        if tmp_dir is not None:
+            tmp_dir.cleanup()
@@ -1,6 +1,12 @@
 from aim import Repo, Run
+from aim.storage.treeutils import decode_tree, encode_tree
+import base64
 import click
 import datetime
+from fnmatch import fnmatch
+import gzip
+import json
+import os
 import time
 from tqdm import tqdm
 
@@ -10,26 +16,178 @@ from ..utils import (
     INFO,
     DETAIL,
     DEBUG,
+    FetchPolicy,
+    RateLimiter,
     chunker,
     fetch,
     get_verbosity,
     install_signal_handler,
+    jitter_time,
     log,
-    set_fetch,
     set_verbosity,
     should_exit,
 )
 
-def fetch_items(view):
-    return fetch("items", lambda v: list(v.items()), args=[view])
+def fetch_items(view, policy=None):
+    return fetch("items", lambda v: list(v.items()), args=[view], policy=policy)
 
-def fetch_run(repo, run_hash):
-    return fetch("run", lambda r, h: r.get_run(h), args=[repo, run_hash])
+def fetch_run(repo, run_hash, policy=None):
+    return fetch("run", lambda r, h: r.get_run(h), args=[repo, run_hash], policy=policy)
 
-def fetch_traces(run_tree):
-    return fetch("traces", lambda x: x.get('traces', None), args=[run_tree])
+def fetch_tree(tree, policy=None):
+    def collect(t):
+        try:
+            return t[...]
+        except KeyError:
+            return None
+    return fetch("tree", collect, args=[tree], policy=policy)
+
+def fetch_next_key(view, policy=None):
+    def next_key(v):
+        try:
+            return v.last_idx() + 1
+        except KeyError:
+            return 0
+    return fetch("next key", next_key, args=[view], policy=policy)
+
+def fetch_run_states(repo, run_hashes, policy=None):
+    def collect(db, hashes):
+        return {run.hash: (run.creation_time, run.end_time) for chunk in chunker(hashes, 500) for run in db.find_runs(chunk)}
+    structured_db = getattr(repo, 'structured_db', None)
+    if structured_db is not None:
+        try:
+            return fetch("run states", collect, args=[structured_db, list(run_hashes)], policy=policy)
+        except (AttributeError, NotImplementedError) as e:
+            log(DEBUG, f"bulk query of run states not supported - {e}")
+    states = {}
+    for run_hash in run_hashes:
+        try:
+            run = fetch_run(repo, run_hash, policy=policy)
+        except Exception as e:
+            log(ERROR, f"failed to fetch run state of {run_hash} - {e}")
+            continue
+        if run is not None:
+            states[run_hash] = (run.creation_time, run.end_time)
+    return states
+
+def try_fetch_run_states(repo, run_hashes, policy=None):
+    try:
+        return fetch_run_states(repo, run_hashes, policy=policy)
+    except Exception as e:
+        log(ERROR, f"failed to fetch run states - {e}")
+        return None
+
+def diff_trees(src, dst, path=()):
+    if isinstance(src, dict) and isinstance(dst, dict):
+        for key, val in src.items():
+            if key not in dst:
+                yield path + (key,), val
+            elif val is not dst[key] and val != dst[key]:
+                yield from diff_trees(val, dst[key], path + (key,))
+        for key in dst.keys() - src.keys():
+            yield path + (key,), Ellipsis
+    elif src != dst:
+        yield path, src
+
+def match_context(context, spec):
+    for pair in filter(None, spec.split(",")):
+        key, _, pattern = pair.partition("=")
+        if key.strip() not in context or not fnmatch(str(context[key.strip()]), pattern.strip()):
+            return False
+    return True
+
+def match_sequence(name, context, metric=None, exclude_metric=None, context_spec=None):
+    if metric and not any(fnmatch(name, pattern) for pattern in metric):
+        return False
+    if exclude_metric and any(fnmatch(name, pattern) for pattern in exclude_metric):
+        return False
+    if context_spec and not any(match_context(context, spec) for spec in context_spec):
+        return False
+    return True
+
+def filter_meta(meta, run_hash, select):
+    run_meta = ((meta or {}).get('chunks') or {}).get(run_hash) or {}
+    traces = run_meta.get('traces') or {}
+    typed_traces = [t for t in (run_meta.get('typed_traces') or {}).values() if isinstance(t, dict)]
+    for ctx_traces in [traces] + typed_traces:
+        for ctx_id, names in ctx_traces.items():
+            if not isinstance(names, dict):
+                continue
+            for name in [name for name in names if not select(ctx_id, name)]:
+                del names[name]
+        for ctx_id in [ctx_id for ctx_id, names in ctx_traces.items() if names == {}]:
+            del ctx_traces[ctx_id]
+    return meta
+
+SEQUENCE_ARRAYS = {
+    'v2': (('val', None), ('step', 'int64'), ('epoch', 'int64'), ('time', 'int64')),
+    'v1': (('val', None), ('epoch', 'int64'), ('time', 'int64')),
+}
+
+def step_stride(last, min_step, every, max_points):
+    stride = max(every, 1)
+    if max_points > 0:
+        while (last - min_step) // stride + 1 > max_points:
+            stride *= 2
+    return stride
+
+def keep_step(step, min_step, max_step, stride):
+    return step >= min_step and (max_step is None or step <= max_step) and (step - min_step) % stride == 0
+
+def on_grid(items, kept, values=True):
+    return all((v if values else k) in kept for k, v in items)
+
+def reset_sequence(tree, version):
+    views = []
+    for array_name, dtype in SEQUENCE_ARRAYS[version]:
+        try:
+            del tree[array_name]
+        except KeyError:
+            pass
+        views.append(tree.array(array_name, dtype=dtype).allocate())
+    return views
+
+def sync_run(
+        src_repo,
+        run_hash,
+        dest_repo,
+        dest_run_hash,
+        mass_update,
+        retries,
+        sleep,
+        full_copy,
+        metric=None,
+        exclude_metric=None,
+        context=None,
+        min_step=0,
+        max_step=None,
+        every=1,
+        max_points=0,
+        limiter=None,
+        policy=None,
+    ):
+    policy = FetchPolicy(retries, sleep) if policy is None else policy
+    selective = bool(metric or exclude_metric or context)
+    downsample = bool(min_step > 0 or max_step is not None or every > 1 or max_points > 0)
+    contexts = {}
+
+    def throttle(items, requests=1):
+        if limiter is not None:
+            limiter.throttle(items, requests)
+
+    def select(ctx_id, name):
+        return match_sequence(name, contexts.get(ctx_id) or {}, metric, exclude_metric, context)
+
+    def select_steps(steps):
+        if not downsample:
+            return steps
+        last = max(steps, default=min_step)
+        if max_step is not None:
+            last = min(last, max_step)
+        stride = step_stride(last, min_step, every, max_points)
+        log(DEBUG, f"downsampling with stride {stride}")
+        return [step for step in steps if keep_step(step, min_step, max_step, stride)]
 
-def sync_run(src_repo, run_hash, dest_repo, dest_run_hash, mass_update, retries, sleep, full_copy):
     def copy_trees():
         nonlocal mass_update
         num_chunks = num_items = 0
@@ -41,10 +199,31 @@ def sync_run(src_repo, run_hash, dest_repo, dest_run_hash, mass_update, retries,
             'meta', dest_run_hash, read_only=False, from_union=False, no_cache=True
         ).subtree('meta')
         dest_meta_run_tree = dest_meta_tree.subtree('chunks').subtree(dest_run_hash)
-        dest_traces = None if full_copy else fetch_traces(dest_meta_run_tree)
-        dest_meta_tree[...] = source_meta_tree[...]
-        dest_index = dest_repo._get_index_tree('meta', timeout=10).view(())
-        dest_meta_run_tree.finalize(index=dest_index)
+        source_meta = fetch_tree(source_meta_tree, policy=policy)
+        if source_meta is None:
+            raise KeyError(f"run meta tree of {run_hash} not found in source repository")
+        contexts.update(((source_meta or {}).get('chunks') or {}).get(run_hash, {}).get('contexts') or {})
+        if selective:
+            source_meta = filter_meta(source_meta, run_hash, select)
+        if full_copy:
+            dest_traces = None
+            changes = [((), source_meta)]
+        else:
+            dest_meta = fetch_tree(dest_meta_tree, policy=policy)
+            dest_traces = ((dest_meta or {}).get('chunks') or {}).get(dest_run_hash, {}).get('traces', None)
+            changes = list(diff_trees(source_meta, dest_meta))
+        log(DETAIL, f"{len(changes)} changed keys in run meta tree")
+        for path, val in changes:
+            log(DEBUG, f"updating meta key {path}")
+            throttle(1)
+            if val is Ellipsis:
+                del dest_meta_tree[path]
+            else:
+                dest_meta_tree[path if path else ...] = val
+        dest_index = None
+        if changes:
+            dest_index = dest_repo._get_index_tree('meta', timeout=10).view(())
+            dest_meta_run_tree.finalize(index=dest_index)
 
         log(DETAIL, "copy run series tree")
         source_series_run_tree = src_repo.request_tree(
@@ -59,6 +238,9 @@ def sync_run(src_repo, run_hash, dest_repo, dest_run_hash, mass_update, retries,
         dest_v2_tree = dest_series_run_tree.subtree(('v2', 'chunks', dest_run_hash))
         for ctx_id in source_v2_tree.keys():
             for metric_name in source_v2_tree.subtree(ctx_id).keys():
+                if selective and not select(ctx_id, metric_name):
+                    log(DEBUG, f"skipping unselected sequence {ctx_id}/{metric_name}")
+                    continue
                 log(DEBUG, f"obtain val view for {ctx_id}/{metric_name}")
                 source_val_view = source_v2_tree.subtree((ctx_id, metric_name)).array('val')
                 log(DEBUG, f"obtain step view for {ctx_id}/{metric_name}")
@@ -84,8 +266,20 @@ def sync_run(src_repo, run_hash, dest_repo, dest_run_hash, mass_update, retries,
                         _metric = _context.get(metric_name, None)
                         if _metric is not None:
                             last_step = _metric.get('last_step', -1)
-                new_keys = {k for k, v in fetch_items(source_step_view) if v > last_step}
+                source_steps = fetch_items(source_step_view, policy=policy)
+                new_steps = set(select_steps([v for _, v in source_steps]))
+                new_keys = sorted(k for k, v in source_steps if v > last_step and v in new_steps)
                 log(DETAIL, f"last step for {metric_name} is {last_step} and there are {len(new_keys)} new keys")
+                if downsample:
+                    base = 0 if full_copy else fetch_next_key(dest_step_view, policy=policy)
+                    if max_points > 0 and not on_grid(fetch_items(dest_step_view, policy=policy), new_steps):
+                        log(DETAIL, f"downsampling grid for {metric_name} changed - rewriting sequence")
+                        dest_val_view, dest_step_view, dest_epoch_view, dest_time_view = reset_sequence(dest_v2_tree.subtree((ctx_id, metric_name)), 'v2')
+                        new_keys = sorted(k for k, v in source_steps if v in new_steps)
+                        base = 0
+                    key_map = {k: base + i for i, k in enumerate(new_keys)}
+                else:
+                    key_map = {k: k for k in new_keys}
 
                 if mass_update < 0:
                     try:
@@ -97,33 +291,38 @@ def sync_run(src_repo, run_hash, dest_repo, dest_run_hash, mass_update, retries,
                         mass_update = 0
                         log(DETAIL, f"unable to detect mass update-compatible server - deactivating mass update")
                 if mass_update:
-                    for chunk in chunker([x for x in fetch_items(source_val_view) if x[0] in new_keys], size=mass_update):
+                    for chunk in chunker([(key_map[k], x) for k, x in fetch_items(source_val_view, policy=policy) if k in key_map], size=mass_update):
                         log(DEBUG, f"updating {len(chunk)} value items")
+                        throttle(len(chunk))
                         dest_val_view.update(chunk)
                         num_chunks += 1
                         num_items += len(chunk)
-                    for chunk in chunker([x for x in fetch_items(source_step_view) if x[0] in new_keys], size=mass_update):
+                    for chunk in chunker([(key_map[k], x) for k, x in source_steps if k in key_map], size=mass_update):
                         log(DEBUG, f"updating {len(chunk)} step items")
+                        throttle(len(chunk))
                         dest_step_view.update(chunk)
                         num_chunks += 1
                         num_items += len(chunk)
-                    for chunk in chunker([x for x in fetch_items(source_epoch_view) if x[0] in new_keys], size=mass_update):
+                    for chunk in chunker([(key_map[k], x) for k, x in fetch_items(source_epoch_view, policy=policy) if k in key_map], size=mass_update):
                         log(DEBUG, f"updating {len(chunk)} epoch items")
+                        throttle(len(chunk))
                         dest_epoch_view.update(chunk)
                         num_chunks += 1
                         num_items += len(chunk)
-                    for chunk in chunker([x for x in fetch_items(source_time_view) if x[0] in new_keys], size=mass_update):
+                    for chunk in chunker([(key_map[k], x) for k, x in fetch_items(source_time_view, policy=policy) if k in key_map], size=mass_update):
                         log(DEBUG, f"updating {len(chunk)} time items")
+                        throttle(len(chunk))
                         dest_time_view.update(chunk)
                         num_chunks += 1
                         num_items += len(chunk)
                     continue
-                for key, val in (x for x in fetch_items(source_val_view) if x[0] in new_keys):
+                for key, val in (x for x in fetch_items(source_val_view, policy=policy) if x[0] in key_map):
                     log(DEBUG, f"updating single value, step, epoch, and time")
-                    dest_val_view[key] = val
-                    dest_step_view[key] = source_step_view[key]
-                    dest_epoch_view[key] = source_epoch_view[key]
-                    dest_time_view[key] = source_time_view[key]
+                    throttle(4, 4)
+                    dest_val_view[key_map[key]] = val
+                    dest_step_view[key_map[key]] = source_step_view[key]
+                    dest_epoch_view[key_map[key]] = source_epoch_view[key]
+                    dest_time_view[key_map[key]] = source_time_view[key]
                     num_chunks += 4
                     num_items += 4
         log(DETAIL, "finished syncing v2 sequences")
@@ -133,6 +332,9 @@ def sync_run(src_repo, run_hash, dest_repo, dest_run_hash, mass_update, retries,
         dest_v1_tree = dest_series_run_tree.subtree(('chunks', dest_run_hash))
         for ctx_id in source_v1_tree.keys():
             for metric_name in source_v1_tree.subtree(ctx_id).keys():
+                if selective and not select(ctx_id, metric_name):
+                    log(DEBUG, f"skipping unselected sequence {ctx_id}/{metric_name}")
+                    continue
                 log(DEBUG, f"obtain val view for {ctx_id}/{metric_name}")
                 source_val_view = source_v1_tree.subtree((ctx_id, metric_name)).array('val')
                 log(DEBUG, f"obtain epoch view for {ctx_id}/{metric_name}")
@@ -154,27 +356,38 @@ def sync_run(src_repo, run_hash, dest_repo, dest_run_hash, mass_update, retries,
                         _metric = _context.get(metric_name, None)
                         if _metric is not None:
                             last_step = _metric.get('last_step', -1)
-                log(DETAIL, f"last step for {metric_name} is {last_step} and there are {len([x for x in fetch_items(source_val_view) if x[0] > last_step]) if get_verbosity() >= DETAIL else None} new keys")
+                source_vals = fetch_items(source_val_view, policy=policy)
+                selected_keys = set(select_steps([k for k, _ in source_vals]))
+                new_keys = {k for k in selected_keys if k > last_step}
+                if max_points > 0 and not on_grid(fetch_items(dest_val_view, policy=policy), selected_keys, values=False):
+                    log(DETAIL, f"downsampling grid for {metric_name} changed - rewriting sequence")
+                    dest_val_view, dest_epoch_view, dest_time_view = reset_sequence(dest_v1_tree.subtree((ctx_id, metric_name)), 'v1')
+                    new_keys = selected_keys
+                log(DETAIL, f"last step for {metric_name} is {last_step} and there are {len(new_keys)} new keys")
 
                 if mass_update:
-                    for chunk in chunker([x for x in fetch_items(source_val_view) if x[0] > last_step], size=mass_update):
+                    for chunk in chunker([x for x in source_vals if x[0] in new_keys], size=mass_update):
                         log(DEBUG, f"updating {len(chunk)} value items")
+                        throttle(len(chunk))
                         dest_val_view.update(chunk)
                         num_chunks += 1
                         num_items += len(chunk)
-                    for chunk in chunker([x for x in fetch_items(source_epoch_view) if x[0] > last_step], size=mass_update):
+                    for chunk in chunker([x for x in fetch_items(source_epoch_view, policy=policy) if x[0] in new_keys], size=mass_update):
                         log(DEBUG, f"updating {len(chunk)} epoch items")
+                        throttle(len(chunk))
                         dest_epoch_view.update(chunk)
                         num_chunks += 1
                         num_items += len(chunk)
-                    for chunk in chunker([x for x in fetch_items(source_time_view) if x[0] > last_step], size=mass_update):
+                    for chunk in chunker([x for x in fetch_items(source_time_view, policy=policy) if x[0] in new_keys], size=mass_update):
                         log(DEBUG, f"updating {len(chunk)} time items")
+                        throttle(len(chunk))
                         dest_time_view.update(chunk)
                         num_chunks += 1
                         num_items += len(chunk)
                     continue
-                for key, val in (x for x in fetch_items(source_val_view) if x[0] > last_step):
+                for key, val in (x for x in source_vals if x[0] in new_keys):
                     log(DEBUG, f"updating single value, epoch, and time")
+                    throttle(3, 3)
                     dest_val_view[key] = val
                     dest_epoch_view[key] = source_epoch_view[key]
                     dest_time_view[key] = source_time_view[key]
@@ -211,6 +424,16 @@ def sync_run(src_repo, run_hash, dest_repo, dest_run_hash, mass_update, retries,
             log(DETAIL, "finished copying run trees")
     return num_chunks, num_items
 
+def wait_or_exit(wait_time):
+    while wait_time > 0:
+        time.sleep(min(wait_time, 1.0))
+        log(DETAIL, ".", nl=False)
+        wait_time -= 1.0
+        if should_exit():
+            log(DETAIL, " interrupted")
+            return False
+    return True
+
 @click.group()
 def _sync():
     pass
@@ -231,9 +454,23 @@ def _sync():
 @click.option("--raise-errors", is_flag=True, help="Raise errors during synchronization (default: False)")
 @click.option("--verbosity", default=get_verbosity(), help=f"Verbosity of the output (default: {get_verbosity()})")
 @click.option("--full-copy", is_flag=True, help="Full copy of the runs (default: False)")
-def sync(src_repo_path, dst_repo_path, run, retarget, offset, eps, retries, sleep, repeat, force, first, last, mass_update, raise_errors, verbosity, full_copy):
+@click.option("--metric", default=None, multiple=True, help="Metric name(s) or pattern(s) to synchronize (default: all)")
+@click.option("--exclude-metric", default=None, multiple=True, help="Metric name(s) or pattern(s) not to synchronize (default: None)")
+@click.option("--context", default=None, multiple=True, help="Context(s) to synchronize as comma-separated key=pattern pairs (default: all)")
+@click.option("--min-step", default=0, help="First step to synchronize (default: 0)")
+@click.option("--max-step", default=None, type=int, help="Last step to synchronize (default: None)")
+@click.option("--every", default=1, help="Synchronize only every n-th step (default: 1)")
+@click.option("--max-points", default=0, help="Maximum number of points per sequence (0 to deactivate) (default: 0)")
+@click.option("--max-items-per-second", default=0.0, help="Maximum number of items written per second (0 to deactivate) (default: 0)")
+@click.option("--max-requests-per-second", default=0.0, help="Maximum number of write requests per second (0 to deactivate) (default: 0)")
+@click.option("--rate-file", default=None, type=str, help="File to share the rate limits between processes on this node (default: None)")
+@click.option("--jitter", default=0.0, help="Maximum random delay in seconds before each synchronization (default: 0)")
+@click.option("--max-sleep", default=30.0, help="Maximum sleep time in seconds between retries with exponential backoff (default: 30.0)")
+@click.option("--deadline", default=0.0, help="Deadline in seconds for fetching data including retries (0 to deactivate) (default: 0)")
+@click.option("--hedge", default=0.0, help="Latency percentile (e.g. 95) after which a second request is issued (0 to deactivate) (default: 0)")
+def sync(src_repo_path, dst_repo_path, run, retarget, offset, eps, retries, sleep, repeat, force, first, last, mass_update, raise_errors, verbosity, full_copy, metric, exclude_metric, context, min_step, max_step, every, max_points, max_items_per_second, max_requests_per_second, rate_file, jitter, max_sleep, deadline, hedge):
     install_signal_handler()
-    do_sync(src_repo_path, dst_repo_path, run, retarget, offset, eps, retries, sleep, repeat, force, first, last, mass_update, raise_errors, verbosity, full_copy)
+    do_sync(src_repo_path, dst_repo_path, run, retarget, offset, eps, retries, sleep, repeat, force, first, last, mass_update, raise_errors, verbosity, full_copy, metric, exclude_metric, context, min_step, max_step, every, max_points, max_items_per_second, max_requests_per_second, rate_file, jitter, max_sleep, deadline, hedge)
 
 def do_sync(
         src_repo_path,
@@ -252,9 +489,30 @@ def do_sync(
         raise_errors=False,
         verbosity=get_verbosity(),
         full_copy=False,
+        metric=None,
+        exclude_metric=None,
+        context=None,
+        min_step=0,
+        max_step=None,
+        every=1,
+        max_points=0,
+        max_items_per_second=0,
+        max_requests_per_second=0,
+        rate_file=None,
+        jitter=0,
+        max_sleep=30,
+        deadline=0,
+        hedge=0,
     ):
     set_verbosity(verbosity)
-    set_fetch(retries, sleep)
+    policy = FetchPolicy(retries, sleep, max_sleep=max_sleep, deadline=deadline, hedge=hedge)
+    limiter = RateLimiter(max_items_per_second, max_requests_per_second, rate_file)
+    wait_time = jitter_time(jitter)
+    if wait_time > 0:
+        log(DETAIL, f"waiting {wait_time:.2f}s before first synchronization: ", nl=False)
+        if not wait_or_exit(wait_time):
+            return
+        log(DETAIL, " done")
     while True:
         src_repo = None
         dst_repo = None
@@ -277,32 +535,51 @@ def do_sync(
                 _first += len(runs)
             while _last < 0:
                 _last += len(runs)
-            for idx, run_hash in tqdm(enumerate(runs), total=len(runs), disable=verbosity < PROGRESS):
-                if idx < _first or idx > _last:
-                    continue
-                if should_exit():
-                    break
-                try:
+            runs = [run_hash for idx, run_hash in enumerate(runs) if _first <= idx <= _last]
+            if retarget is not None:
+                log(DETAIL, f"fetching run for {retarget} from destination repository")
+                if fetch_run(dst_repo, retarget, policy=policy) is None:
+                    log(ERROR, f"run hash {retarget} needs to be created in destination repository when retargeting")
+                    return
+            pending = []
+            if force:
+                for run_hash in runs:
+                    log(INFO, f"syncing {run_hash if retarget is None else retarget}: force synchronization")
+                    pending.append(run_hash)
+            else:
+                log(DETAIL, f"fetching run states from source repository")
+                src_states = try_fetch_run_states(src_repo, runs, policy=policy)
+                log(DETAIL, f"fetching run states from destination repository")
+                dst_states = try_fetch_run_states(dst_repo, sorted({run_hash if retarget is None else retarget for run_hash in runs}), policy=policy)
+                for run_hash in runs:
                     dst_run_hash = run_hash if retarget is None else retarget
-                    log(DETAIL, f"fetching run for {dst_run_hash} from destination repository")
-                    dst_run = fetch_run(dst_repo, dst_run_hash)
-                    if dst_run is None and retarget is not None:
-                        log(ERROR, f"run hash {dst_run_hash} needs to be created in destination repository when retargeting")
-                        return
-                    if force:
-                        log(INFO, f"syncing {dst_run_hash}: force synchronization")
-                    elif dst_run is None:
+                    if src_states is None or dst_states is None:
+                        log(INFO, f"syncing {run_hash}: run states not available")
+                    elif dst_run_hash not in dst_states:
                         log(INFO, f"syncing {dst_run_hash}: run hash not found in destination repository")
+                    elif run_hash not in src_states:
+                        log(INFO, f"syncing {run_hash}: run hash not found in source repository index")
+                    elif not src_states[run_hash][1]:
+                        log(INFO, f"syncing {run_hash}: run is active in source repository")
+                    elif not dst_states[dst_run_hash][1]:
+                        log(INFO, f"syncing {run_hash}: run is active in destination repository")
                     else:
-                        log(DETAIL, f"fetching run for {run_hash} from source repository")
-                        src_run = fetch_run(src_repo, run_hash)
-                        diff = abs(src_run.duration + offset - dst_run.duration)
-                        if src_run.active == dst_run.active and diff < eps:
+                        src_creation_time, src_end_time = src_states[run_hash]
+                        dst_creation_time, dst_end_time = dst_states[dst_run_hash]
+                        diff = abs((src_end_time - src_creation_time) + offset - (dst_end_time - dst_creation_time))
+                        if diff < eps:
                             log(INFO, f"skipping {run_hash}: run hash exists with {diff} difference in duration")
                             skips.append(run_hash)
                             continue
                         log(INFO, f"syncing {run_hash}: run hash exists with {diff} difference in duration")
-                    num_chunks, num_items = sync_run(src_repo, run_hash, dst_repo, dst_run_hash, mass_update=mass_update, retries=retries, sleep=sleep, full_copy=full_copy)
+                    pending.append(run_hash)
+            log(DETAIL, f"{len(pending)} of {len(runs)} runs need synchronization")
+            for run_hash in tqdm(pending, disable=verbosity < PROGRESS):
+                if should_exit():
+                    break
+                try:
+                    dst_run_hash = run_hash if retarget is None else retarget
+                    num_chunks, num_items = sync_run(src_repo, run_hash, dst_repo, dst_run_hash, mass_update=mass_update, retries=retries, sleep=sleep, full_copy=full_copy, metric=metric, exclude_metric=exclude_metric, context=context, min_step=min_step, max_step=max_step, every=every, max_points=max_points, limiter=limiter, policy=policy)
                     log(INFO, f"sucesss: successfully synchronized {run_hash} to {dst_run_hash} ({num_chunks} chunks and {num_items} items copied)")
                     successes.append(run_hash)
                 except Exception as e:
@@ -331,13 +608,344 @@ def do_sync(
                 run.close()
         if repeat <= 0 or should_exit():
             return
-        wait_time = repeat
+        wait_time = repeat + jitter_time(jitter)
         log(INFO, f"waiting {wait_time}s before next repetition: ", nl=False)
-        while wait_time > 0:
-            time.sleep(min(wait_time, 1.0))
-            log(DETAIL, ".", nl=False)
-            wait_time -= 1.0
-            if should_exit():
-                log(DETAIL, " interrupted")
-                return
+        if not wait_or_exit(wait_time):
+            return
         log(INFO, " done")
+
+BUNDLE_FORMAT = "aimrun-bundle"
+BUNDLE_VERSION = 2
+
+def pack_tree(tree):
+    if tree is None:
+        return None
+    return [[base64.b64encode(key).decode("ascii"), base64.b64encode(val).decode("ascii")] for key, val in encode_tree(tree)]
+
+def unpack_tree(packed):
+    if packed is None:
+        return None
+    return decode_tree((base64.b64decode(key), base64.b64decode(val)) for key, val in packed)
+
+def write_record(f, record):
+    f.write(json.dumps(record))
+    f.write("\n")
+
+def read_records(f):
+    for line in f:
+        if line.strip():
+            yield json.loads(line)
+
+def load_export_state(state_path):
+    if state_path is None or not os.path.exists(state_path):
+        return {}
+    with open(state_path) as f:
+        state = json.load(f)
+    return {run_hash: {
+        'end_time': run_state.get('end_time', None),
+        'last_steps': {(version, ctx_id, name): last_step for version, ctx_id, name, last_step in run_state.get('last_steps', [])},
+    } for run_hash, run_state in state.items()}
+
+def save_export_state(state_path, state):
+    tmp_path = f"{state_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({run_hash: {
+            'end_time': run_state['end_time'],
+            'last_steps': [[*key, last_step] for key, last_step in run_state['last_steps'].items()],
+        } for run_hash, run_state in state.items()}, f)
+    os.replace(tmp_path, state_path)
+
+def export_run(src_repo, run_hash, run_state, policy=None):
+    log(DETAIL, "export run meta tree")
+    meta = fetch_tree(src_repo.request_tree(
+        'meta', run_hash, read_only=True, from_union=False, no_cache=True
+    ).subtree('meta'), policy=policy)
+    log(DETAIL, "export run structured properties")
+    source_structured_run = src_repo.request_props(run_hash, read_only=True)
+    props = {
+        'creation_time': source_structured_run.creation_time,
+        'name': source_structured_run.name,
+        'experiment': source_structured_run.experiment,
+        'description': source_structured_run.description,
+        'archived': source_structured_run.archived,
+        'tags': list(source_structured_run.tags),
+    }
+    source_series_run_tree = src_repo.request_tree(
+        'seqs', run_hash, read_only=True, no_cache=True
+    ).subtree('seqs')
+    last_steps = dict(run_state.get('last_steps', {})) if run_state else {}
+    sequences = []
+    num_items = 0
+    for version, path in (('v2', ('v2', 'chunks', run_hash)), ('v1', ('chunks', run_hash))):
+        log(DETAIL, f"export {version} sequences")
+        source_tree = source_series_run_tree.subtree(path)
+        for ctx_id in source_tree.keys():
+            for metric_name in source_tree.subtree(ctx_id).keys():
+                last_step = last_steps.get((version, ctx_id, metric_name), -1)
+                arrays = {
+                    array_name: fetch_items(source_tree.subtree((ctx_id, metric_name)).array(array_name, dtype=dtype), policy=policy)
+                    for array_name, dtype in SEQUENCE_ARRAYS[version]
+                }
+                if version == 'v2':
+                    new_keys = {k for k, v in arrays['step'] if v > last_step}
+                else:
+                    new_keys = {k for k, _ in arrays['val'] if k > last_step}
+                log(DETAIL, f"last step for {metric_name} is {last_step} and there are {len(new_keys)} new keys")
+                if not new_keys:
+                    continue
+                arrays = {array_name: {k: v for k, v in items if k in new_keys} for array_name, items in arrays.items()}
+                sequences.append((version, ctx_id, metric_name, arrays))
+                num_items += sum(len(items) for items in arrays.values())
+                last_steps[(version, ctx_id, metric_name)] = max(arrays['step'].values() if version == 'v2' else arrays['val'].keys())
+    record = {
+        'hash': run_hash,
+        'meta': pack_tree(meta),
+        'props': props,
+        'sequences': [(version, ctx_id, metric_name, {array_name: pack_tree(items) for array_name, items in arrays.items()})
+                      for version, ctx_id, metric_name, arrays in sequences],
+    }
+    return record, last_steps, num_items
+
+def import_run(dest_repo, record, mass_update, limiter=None, policy=None):
+    dest_run_hash = record['hash']
+    num_chunks = num_items = 0
+
+    def throttle(items, requests=1):
+        if limiter is not None:
+            limiter.throttle(items, requests)
+
+    def import_trees():
+        nonlocal mass_update, num_chunks, num_items
+        log(DETAIL, "import run meta tree")
+        dest_meta_tree = dest_repo.request_tree(
+            'meta', dest_run_hash, read_only=False, from_union=False, no_cache=True
+        ).subtree('meta')
+        source_meta = unpack_tree(record['meta'])
+        if source_meta is None:
+            raise KeyError(f"bundle contains no run meta tree for {dest_run_hash}")
+        changes = list(diff_trees(source_meta, fetch_tree(dest_meta_tree, policy=policy)))
+        log(DETAIL, f"{len(changes)} changed keys in run meta tree")
+        for path, val in changes:
+            log(DEBUG, f"updating meta key {path}")
+            throttle(1)
+            if val is Ellipsis:
+                del dest_meta_tree[path]
+            else:
+                dest_meta_tree[path if path else ...] = val
+        if changes:
+            dest_index = dest_repo._get_index_tree('meta', timeout=10).view(())
+            dest_meta_tree.subtree('chunks').subtree(dest_run_hash).finalize(index=dest_index)
+
+        log(DETAIL, "import sequences")
+        dest_series_run_tree = dest_repo.request_tree(
+            'seqs', dest_run_hash, read_only=False, no_cache=True
+        ).subtree('seqs')
+        for version, ctx_id, metric_name, arrays in record['sequences']:
+            path = ('v2', 'chunks', dest_run_hash) if version == 'v2' else ('chunks', dest_run_hash)
+            dest_tree = dest_series_run_tree.subtree(path + (ctx_id, metric_name))
+            for array_name, dtype in SEQUENCE_ARRAYS[version]:
+                log(DEBUG, f"allocate {array_name} view for {ctx_id}/{metric_name}")
+                dest_view = dest_tree.array(array_name, dtype=dtype).allocate()
+                items = sorted(unpack_tree(arrays[array_name]).items())
+                if mass_update < 0:
+                    try:
+                        dest_view.update([])
+                        mass_update = -mass_update
+                        log(DETAIL, f"detected mass update-compatible server - using chunk size of {mass_update}")
+                    except Exception:
+                        mass_update = 0
+                        log(DETAIL, f"unable to detect mass update-compatible server - deactivating mass update")
+                if mass_update:
+                    for chunk in chunker(items, size=mass_update):
+                        log(DEBUG, f"updating {len(chunk)} {array_name} items")
+                        throttle(len(chunk))
+                        dest_view.update(chunk)
+                        num_chunks += 1
+                        num_items += len(chunk)
+                    continue
+                for key, val in items:
+                    throttle(1)
+                    dest_view[key] = val
+                    num_chunks += 1
+                    num_items += 1
+
+    def import_structured_props():
+        log(DETAIL, "import run structured properties")
+        props = record['props']
+        created_at = datetime.datetime.fromtimestamp(props['creation_time'], tz=datetime.timezone.utc)
+        dest_structured_run = dest_repo.request_props(dest_run_hash,
+                                                        read_only=False,
+                                                        created_at=created_at)
+        dest_structured_run.name = props['name']
+        dest_structured_run.experiment = props['experiment']
+        dest_structured_run.description = props['description']
+        dest_structured_run.archived = props['archived']
+        for tag in props['tags']:
+            dest_structured_run.add_tag(tag)
+
+    if dest_repo.is_remote_repo:
+        import_trees()
+        import_structured_props()
+    else:
+        with dest_repo.structured_db:
+            import_structured_props()
+            import_trees()
+    return num_chunks, num_items
+
+@_sync.command()
+@click.argument("src_repo_path", type=str)
+@click.argument("bundle_path", type=str)
+@click.option("--run", default=None, multiple=True, help="Specific run hash(es) to export (default: None)")
+@click.option("--state-path", default="aimrun-export-state.json", help="Path to the state of previous exports (default: aimrun-export-state.json)")
+@click.option("--retries", default=10, help="Number of retries to fetch run (default: 10)")
+@click.option("--sleep", default=1.0, help="Sleep time in seconds between retries (default: 1.0)")
+@click.option("--force", is_flag=True, help="Force export of all runs (default: False)")
+@click.option("--full-copy", is_flag=True, help="Export the runs ignoring previous exports (default: False)")
+@click.option("--raise-errors", is_flag=True, help="Raise errors during export (default: False)")
+@click.option("--verbosity", default=get_verbosity(), help=f"Verbosity of the output (default: {get_verbosity()})")
+@click.option("--max-sleep", default=30.0, help="Maximum sleep time in seconds between retries with exponential backoff (default: 30.0)")
+@click.option("--deadline", default=0.0, help="Deadline in seconds for fetching data including retries (0 to deactivate) (default: 0)")
+@click.option("--hedge", default=0.0, help="Latency percentile (e.g. 95) after which a second request is issued (0 to deactivate) (default: 0)")
+def export(src_repo_path, bundle_path, run, state_path, retries, sleep, force, full_copy, raise_errors, verbosity, max_sleep, deadline, hedge):
+    install_signal_handler()
+    do_export(src_repo_path, bundle_path, run, state_path, retries, sleep, force, full_copy, raise_errors, verbosity, max_sleep, deadline, hedge)
+
+def do_export(
+        src_repo_path,
+        bundle_path,
+        run=None,
+        state_path="aimrun-export-state.json",
+        retries=10,
+        sleep=1,
+        force=False,
+        full_copy=False,
+        raise_errors=False,
+        verbosity=get_verbosity(),
+        max_sleep=30,
+        deadline=0,
+        hedge=0,
+    ):
+    set_verbosity(verbosity)
+    policy = FetchPolicy(retries, sleep, max_sleep=max_sleep, deadline=deadline, hedge=hedge)
+    state = {} if full_copy else load_export_state(state_path)
+    log(DETAIL, f"opening source repository at {src_repo_path}")
+    src_repo = Repo(path=src_repo_path)
+    exported = []
+    failures = []
+    skips = []
+    tmp_path = f"{bundle_path}.tmp"
+    try:
+        log(DETAIL, f"fetching runs from source repository")
+        runs = [r for ru in run for r in ru.split()] if run else [run.hash for run in src_repo.iter_runs()]
+        src_states = try_fetch_run_states(src_repo, runs, policy=policy) or {}
+        with gzip.open(tmp_path, "wt") as f:
+            write_record(f, {'format': BUNDLE_FORMAT, 'version': BUNDLE_VERSION})
+            for run_hash in tqdm(runs, disable=verbosity < PROGRESS):
+                if should_exit():
+                    break
+                end_time = src_states.get(run_hash, (None, None))[1]
+                if not force and end_time is not None and state.get(run_hash, {}).get('end_time', None) == end_time:
+                    log(INFO, f"skipping {run_hash}: run has not changed since last export")
+                    skips.append(run_hash)
+                    continue
+                try:
+                    record, last_steps, num_items = export_run(src_repo, run_hash, state.get(run_hash, None), policy=policy)
+                    write_record(f, record)
+                    state[run_hash] = {'end_time': end_time, 'last_steps': last_steps}
+                    log(INFO, f"sucesss: successfully exported {run_hash} ({num_items} items)")
+                    exported.append(run_hash)
+                except Exception as e:
+                    log(ERROR, f"failure: failed to export {run_hash} - {e}")
+                    failures.append(run_hash)
+                    if raise_errors:
+                        raise e
+        os.replace(tmp_path, bundle_path)
+        save_export_state(state_path, state)
+        if len(skips) > 0:
+            log(PROGRESS, f"summary: skipped {len(skips)} runs - {' '.join(skips)}")
+        if len(exported) > 0:
+            log(PROGRESS, f"summary: successfully exported {len(exported)} runs to {bundle_path} - {' '.join(exported)}")
+        if len(failures) > 0:
+            log(PROGRESS, f"summary: failed to export {len(failures)} runs - {' '.join(failures)}")
+    except Exception as e:
+        log(ERROR, f"failure: failed to export runs - {e}")
+        if raise_errors:
+            raise e
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        src_repo.close()
+
+@_sync.command(name="import")
+@click.argument("dst_repo_path", type=str)
+@click.argument("bundle_paths", type=click.Path(exists=True), nargs=-1)
+@click.option("--mass-update", default=-128, help="Mass update chunk size (0 to deactivate, negative to detect) (default: -128)")
+@click.option("--raise-errors", is_flag=True, help="Raise errors during import (default: False)")
+@click.option("--verbosity", default=get_verbosity(), help=f"Verbosity of the output (default: {get_verbosity()})")
+@click.option("--max-items-per-second", default=0.0, help="Maximum number of items written per second (0 to deactivate) (default: 0)")
+@click.option("--max-requests-per-second", default=0.0, help="Maximum number of write requests per second (0 to deactivate) (default: 0)")
+@click.option("--rate-file", default=None, type=str, help="File to share the rate limits between processes on this node (default: None)")
+@click.option("--retries", default=10, help="Number of retries to fetch run (default: 10)")
+@click.option("--sleep", default=1.0, help="Sleep time in seconds between retries (default: 1.0)")
+@click.option("--max-sleep", default=30.0, help="Maximum sleep time in seconds between retries with exponential backoff (default: 30.0)")
+@click.option("--deadline", default=0.0, help="Deadline in seconds for fetching data including retries (0 to deactivate) (default: 0)")
+@click.option("--hedge", default=0.0, help="Latency percentile (e.g. 95) after which a second request is issued (0 to deactivate) (default: 0)")
+def import_(dst_repo_path, bundle_paths, mass_update, raise_errors, verbosity, max_items_per_second, max_requests_per_second, rate_file, retries, sleep, max_sleep, deadline, hedge):
+    install_signal_handler()
+    do_import(dst_repo_path, bundle_paths, mass_update, raise_errors, verbosity, max_items_per_second, max_requests_per_second, rate_file, retries, sleep, max_sleep, deadline, hedge)
+
+def do_import(
+        dst_repo_path,
+        bundle_paths,
+        mass_update=-128,
+        raise_errors=False,
+        verbosity=get_verbosity(),
+        max_items_per_second=0,
+        max_requests_per_second=0,
+        rate_file=None,
+        retries=10,
+        sleep=1,
+        max_sleep=30,
+        deadline=0,
+        hedge=0,
+    ):
+    set_verbosity(verbosity)
+    policy = FetchPolicy(retries, sleep, max_sleep=max_sleep, deadline=deadline, hedge=hedge)
+    limiter = RateLimiter(max_items_per_second, max_requests_per_second, rate_file)
+    log(DETAIL, f"opening destination repository at {dst_repo_path}")
+    dst_repo = Repo(path=dst_repo_path)
+    successes = []
+    failures = []
+    try:
+        for bundle_path in bundle_paths:
+            log(INFO, f"importing bundle {bundle_path}")
+            with gzip.open(bundle_path, "rt") as f:
+                records = read_records(f)
+                header = next(records, None)
+                if not isinstance(header, dict) or header.get('format') != BUNDLE_FORMAT:
+                    raise ValueError(f"{bundle_path} is not an aimrun bundle")
+                if header.get('version') != BUNDLE_VERSION:
+                    raise ValueError(f"{bundle_path} has unsupported bundle version {header.get('version')}")
+                for record in records:
+                    if should_exit():
+                        break
+                    run_hash = record['hash']
+                    try:
+                        num_chunks, num_items = import_run(dst_repo, record, mass_update, limiter=limiter, policy=policy)
+                        log(INFO, f"sucesss: successfully imported {run_hash} ({num_chunks} chunks and {num_items} items copied)")
+                        successes.append(run_hash)
+                    except Exception as e:
+                        log(ERROR, f"failure: failed to import {run_hash} - {e}")
+                        failures.append(run_hash)
+                        if raise_errors:
+                            raise e
+        if len(successes) > 0:
+            log(PROGRESS, f"summary: successfully imported {len(successes)} runs - {' '.join(successes)}")
+        if len(failures) > 0:
+            log(PROGRESS, f"summary: failed to import {len(failures)} runs - {' '.join(failures)}")
+    except Exception as e:
+        log(ERROR, f"failure: failed to import bundles - {e}")
+        if raise_errors:
+            raise e
+    finally:
+        dst_repo.close()
@@ -1,6 +1,11 @@
 import click
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
 from enum import Enum
+import json
+import random
 import signal
+from threading import BoundedSemaphore, Lock, Thread
 import time
 
 # global state
@@ -45,20 +50,160 @@ def set_verbosity(verbosity):
     _verbosity = verbosity
 
 # data fetching
-_retries = 1
-_sleep = 0
-def fetch(name, f, args=[], kwargs={}):
-    retries = _retries
-    while retries:
+NON_RETRYABLE = (AttributeError, KeyError, NotImplementedError, TypeError, ValueError)
+class FetchPolicy:
+    def __init__(self, retries=1, sleep=0, max_sleep=30, deadline=None, hedge=0, hedge_min_samples=20, max_outstanding=4):
+        self.retries = retries
+        self.sleep = sleep
+        self.max_sleep = max_sleep
+        self.deadline = deadline if deadline else None
+        self.hedge = hedge / 100 if hedge > 1 else hedge
+        self.hedge_min_samples = hedge_min_samples
+        self._latencies = {}
+        self._lock = Lock()
+        self._slots = BoundedSemaphore(max_outstanding)
+    def backoff_time(self, attempt):
+        delay = min(self.sleep * 2 ** (attempt - 1), self.max_sleep)
+        return delay / 2 + random.uniform(0, delay / 2)
+    def hedge_delay(self, name):
+        if not self.hedge:
+            return None
+        with self._lock:
+            latencies = sorted(self._latencies.get(name, ()))
+        if len(latencies) < self.hedge_min_samples:
+            return None
+        return latencies[min(int(self.hedge * len(latencies)), len(latencies) - 1)]
+    def record(self, name, latency):
+        with self._lock:
+            self._latencies.setdefault(name, deque(maxlen=1000)).append(latency)
+    def attempt(self, f, args, kwargs, timeout):
+        if not self._slots.acquire(timeout=None if timeout is None else max(timeout, 0)):
+            return None
+        future = Future()
+        def run():
+            try:
+                future.set_result(f(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                self._slots.release()
+        Thread(target=run, daemon=True).start()
+        return future
+    def call(self, name, f, args, kwargs, timeout, pending):
+        hedge_delay = self.hedge_delay(name)
+        start = time.monotonic()
+        if timeout is None and hedge_delay is None and not pending:
+            result = f(*args, **kwargs)
+            self.record(name, time.monotonic() - start)
+            return result
+        future = self.attempt(f, args, kwargs, timeout)
+        if future is not None:
+            pending.add(future)
+        elif not pending:
+            raise TimeoutError(f"no free slot for fetching {name} within {timeout:.2f}s")
+        error = None
+        while pending:
+            wait_time = None if timeout is None else timeout - (time.monotonic() - start)
+            if hedge_delay is not None:
+                hedge_wait = hedge_delay - (time.monotonic() - start)
+                wait_time = hedge_wait if wait_time is None else min(wait_time, hedge_wait)
+            done, _ = wait(pending, timeout=None if wait_time is None else max(wait_time, 0), return_when=FIRST_COMPLETED)
+            pending.difference_update(done)
+            for future in done:
+                if future.exception() is None:
+                    self.record(name, time.monotonic() - start)
+                    pending.clear()
+                    return future.result()
+                error = future.exception()
+            if timeout is not None and time.monotonic() - start >= timeout:
+                raise TimeoutError(f"deadline of {timeout:.2f}s exceeded")
+            if hedge_delay is not None and time.monotonic() - start >= hedge_delay:
+                future = self.attempt(f, args, kwargs, 0)
+                if future is None:
+                    log(DEBUG, f"no response after {hedge_delay:.2f}s - no free slot for hedged request")
+                else:
+                    log(DEBUG, f"no response after {hedge_delay:.2f}s - issuing hedged request")
+                    pending.add(future)
+                hedge_delay = None
+        raise error
+_policy = FetchPolicy()
+def fetch(name, f, args=[], kwargs={}, policy=None):
+    policy = _policy if policy is None else policy
+    start = time.monotonic()
+    attempts = 0
+    pending = set()
+    while True:
+        timeout = None if policy.deadline is None else policy.deadline - (time.monotonic() - start)
         try:
-            return f(*args, **kwargs)
+            return policy.call(name, f, args, kwargs, timeout, pending)
+        except NON_RETRYABLE:
+            raise
         except Exception as e:
-            retries -= 1
-            time.sleep(_sleep)
-    raise RuntimeError(f"failed to fetch {name} after {_retries} retries")
+            attempts += 1
+            log(DEBUG, f"failed to fetch {name} (attempt {attempts}) - {e}")
+            if attempts >= policy.retries:
+                break
+            delay = policy.backoff_time(attempts)
+            if policy.deadline is not None and time.monotonic() - start + delay >= policy.deadline:
+                break
+            time.sleep(delay)
+    raise RuntimeError(f"failed to fetch {name} after {attempts} retries")
 def set_fetch(retries, sleep):
-    global _retries, _sleep
-    _retries, _sleep = retries, sleep
+    global _policy
+    _policy = FetchPolicy(retries, sleep)
+
+# rate limiting
+def lock_file(f):
+    try:
+        import fcntl
+    except ImportError:
+        import msvcrt
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+    else:
+        fcntl.flock(f, fcntl.LOCK_EX)
+class RateLimiter:
+    def __init__(self, items_per_second=0, requests_per_second=0, rate_file=None):
+        self.rates = {"items": items_per_second, "requests": requests_per_second}
+        self.rate_file = rate_file
+        self._state = {}
+        self._lock = Lock()
+    def _take(self, state, demands):
+        now = time.time()
+        wait = 0
+        for name, amount in demands:
+            rate = self.rates[name]
+            tokens, last = state.get(name, (rate, now))
+            tokens = min(rate, tokens + max(now - last, 0) * rate) - amount
+            state[name] = [tokens, now]
+            if tokens < 0:
+                wait = max(wait, -tokens / rate)
+        return wait
+    def throttle(self, items=0, requests=1):
+        demands = [(name, amount) for name, amount in (("items", items), ("requests", requests)) if amount > 0 and self.rates[name] > 0]
+        if not demands:
+            return
+        with self._lock:
+            if self.rate_file is None:
+                wait = self._take(self._state, demands)
+            else:
+                with open(self.rate_file, "a+") as f:
+                    lock_file(f)
+                    f.seek(0)
+                    content = f.read()
+                    try:
+                        state = json.loads(content) if content else {}
+                    except ValueError:
+                        state = {}
+                    wait = self._take(state, demands)
+                    f.seek(0)
+                    f.truncate()
+                    json.dump(state, f)
+        if wait > 0:
+            log(DEBUG, f"rate limit reached - waiting {wait:.2f}s")
+            time.sleep(wait)
+def jitter_time(jitter):
+    return random.uniform(0, jitter) if jitter > 0 else 0
 
 # chunking
 def chunker(seq, size):